@@ -1,39 +1,65 @@
+import asyncio
 import httpx
-import json
+import orjson
 import pydantic
+import stamina
+import time
 
-from datetime import datetime, timezone
+from datetime import datetime, timedelta
 from app.actions.configurations import (
     AuthenticateConfig,
     FetchSamplesConfig,
     PullObservationsConfig
 )
 from app.services.errors import ConfigurationNotFound
-from app.services.utils import find_config_for_action
-from app.services.state import IntegrationStateManager
-from typing import List
+from app.services.state import state_manager
+from typing import List, Optional
 
 
-state_manager = IntegrationStateManager()
+# Shared HTTP client, so connections to the Wialon API are kept alive between calls
+_http_client = None
 
+# Session ids (eid) kept in memory to avoid a state lookup on every call.
+# Deleting the "get_authentication_token" state directly won't force a new login while an eid is cached,
+# use forget_authentication_token() for that.
+AUTH_TOKEN_CACHE_TTL = 600  # Seconds
+_auth_token_cache = {}  # integration_id -> (eid, cached_at)
+_auth_token_locks = {}  # integration_id -> asyncio.Lock
 
-# Pydantic models (representing integration objects to receive/manipulate info from tle external API)
-class WialonDataRequestParamsSpec(pydantic.BaseModel):
-    itemsType: str = "avl_unit"
-    propName: str = "sys_name, sys_id"
-    propValueMask: str = "*"
-    sortType: str = "sys_name"
+# Action configurations indexed by action id, rebuilt whenever the integration comes with a new configurations list
+_configs_by_action = {}  # integration_id -> (configurations, {action_id: config})
+# Parsed auth settings, reused while the integration keeps the same auth configuration
+_auth_configs = {}  # integration_id -> (config, AuthenticateConfig)
+
+
+# Failed connection attempts are retried right away by the transport, before any backoff
+CONNECT_RETRIES = 2
 
+# Retry settings for the calls to Wialon
+RETRY_ATTEMPTS = 3
+RETRY_WAIT_INITIAL = timedelta(seconds=1)
+RETRY_WAIT_MAX = timedelta(seconds=10)
+RETRY_WAIT_JITTER = timedelta(seconds=1)
 
-class WialonDataRequestParams(pydantic.BaseModel):
-    spec: dict = List[WialonDataRequestParamsSpec]
-    force: int = 1
-    flags: int = 1025
-    f: int = pydantic.Field(0, alias="from")
-    to: int = 0
 
+# Params for core/search_items, serialized only once since they don't change between calls
+SEARCH_ITEMS_PARAMS = orjson.dumps({
+    "spec": {
+        "itemsType": "avl_unit",
+        "propName": "sys_name, sys_id",
+        "propValueMask": "*",
+        "sortType": "sys_name"
+    },
+    "force": 1,
+    "flags": 1025,
+    "from": 0,
+    "to": 0
+}).decode()
 
+
+# Pydantic models (representing integration objects to receive/manipulate info from tle external API)
 class WialonDataResponsePos(pydantic.BaseModel):
+    # Unix timestamps are parsed by pydantic itself into UTC datetimes
     t: datetime = pydantic.Field(None, alias="recorded_at")
     f: int = pydantic.Field(0, alias="sensors_flags")
     y: float = pydantic.Field(0.0, alias="latitude")
@@ -46,10 +72,6 @@ class WialonDataResponsePos(pydantic.BaseModel):
     class Config:
         allow_population_by_field_name = True
 
-    @pydantic.validator('t', pre=True)
-    def parse_datetime(cls, v):
-        return datetime.fromtimestamp(v, timezone.utc)
-
 
 class WialonDataResponse(pydantic.BaseModel):
     nm: str = pydantic.Field("", alias="device_name")
@@ -61,29 +83,71 @@ class WialonDataResponse(pydantic.BaseModel):
 
 
 class WialonResponse(pydantic.BaseModel):
-    items: List[WialonDataResponse]
+    error: Optional[int] = None
+    items: List[WialonDataResponse] = []
+
+
+# Bound once, so the search_items path doesn't resolve the classmethod on each response
+_parse_wialon_response = WialonResponse.parse_obj
+
+
+class WialonErrorException(Exception):
+    def __init__(self, error, message=None):
+        self.error = error
+        super().__init__(message or f"Wialon API returned error {error}")
+
+
+class WialonInvalidSessionException(WialonErrorException):
+    pass
+
+
+class WialonServerError(httpx.HTTPStatusError):
+    pass
+
+
+def _raise_for_status(response):
+    # 5xx errors are usually temporary, so they get their own type to be retried
+    if response.status_code >= 500:
+        raise WialonServerError(
+            f"Wialon API returned status {response.status_code}",
+            request=response.request,
+            response=response
+        )
+    response.raise_for_status()
+
+
+def find_config(integration, action_id):
+    integration_id = str(integration.id)
+    cached = _configs_by_action.get(integration_id)
+    if cached is None or cached[0] is not integration.configurations:
+        configs = {}
+        for config in integration.configurations:
+            # Keep the first config of each action, as find_config_for_action() does
+            configs.setdefault(config.action.value, config)
+        cached = (integration.configurations, configs)
+        _configs_by_action[integration_id] = cached
+    return cached[1].get(action_id)
 
 
 def get_auth_config(integration):
     # Look for the login credentials, needed for any action
-    auth_config = find_config_for_action(
-        configurations=integration.configurations,
-        action_id="auth"
-    )
+    auth_config = find_config(integration, "auth")
     if not auth_config:
         raise ConfigurationNotFound(
             f"Authentication settings for integration {str(integration.id)} "
             f"are missing. Please fix the integration setup in the portal."
         )
-    return AuthenticateConfig.parse_obj(auth_config.data)
+    integration_id = str(integration.id)
+    cached = _auth_configs.get(integration_id)
+    if cached is None or cached[0] is not auth_config:
+        cached = (auth_config, AuthenticateConfig.parse_obj(auth_config.data))
+        _auth_configs[integration_id] = cached
+    return cached[1]
 
 
 def get_fetch_samples_config(integration):
     # Look for the login credentials, needed for any action
-    fetch_samples_config = find_config_for_action(
-        configurations=integration.configurations,
-        action_id="fetch_samples"
-    )
+    fetch_samples_config = find_config(integration, "fetch_samples")
     if not fetch_samples_config:
         raise ConfigurationNotFound(
             f"fetch_samples settings for integration {str(integration.id)} "
@@ -94,10 +158,7 @@ def get_fetch_samples_config(integration):
 
 def get_pull_config(integration):
     # Look for the login credentials, needed for any action
-    pull_config = find_config_for_action(
-        configurations=integration.configurations,
-        action_id="pull_observations"
-    )
+    pull_config = find_config(integration, "pull_observations")
     if not pull_config:
         raise ConfigurationNotFound(
             f"pull_config settings for integration {str(integration.id)} "
@@ -106,6 +167,26 @@ def get_pull_config(integration):
     return PullObservationsConfig.parse_obj(pull_config.data)
 
 
+def get_http_client():
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=120,
+            transport=httpx.AsyncHTTPTransport(
+                retries=CONNECT_RETRIES,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=50, keepalive_expiry=30)
+            )
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
 async def build_request_params(integration):
     """
         Call the client's 'ajax.html?svc=token/login' endpoint
@@ -114,70 +195,114 @@ async def build_request_params(integration):
     """
     token = await get_authentication_token(integration, get_auth_config(integration))
 
-    params = WialonDataRequestParams(
-        spec=WialonDataRequestParamsSpec().dict()
-    ).dict(by_alias=True)
-
     return {
-        "params": json.dumps(params),
+        "params": SEARCH_ITEMS_PARAMS,
         "sid": token
     }
 
 
-async def get_authentication_token(integration, config):
-    current_state = await state_manager.get_state(
-        str(integration.id),
-        "get_authentication_token"
-    )
+def _get_cached_authentication_token(integration_id):
+    cached = _auth_token_cache.get(integration_id)
+    if cached and time.monotonic() - cached[1] < AUTH_TOKEN_CACHE_TTL:
+        return cached[0]
+    return None
 
-    if current_state:
-        return current_state["eid"]
 
-    token_endpoint = "ajax.html?svc=token/login"
+async def get_authentication_token(integration, config):
+    integration_id = str(integration.id)
 
-    data = {
-        "params": json.dumps({"token": config.token, "fl": "4"})
-    }
+    if eid := _get_cached_authentication_token(integration_id):
+        return eid
 
-    url = f"{integration.base_url}{token_endpoint}"
+    # Only one task per integration looks up or refreshes the token at a time
+    if integration_id not in _auth_token_locks:
+        _auth_token_locks[integration_id] = asyncio.Lock()
+    async with _auth_token_locks[integration_id]:
+        if eid := _get_cached_authentication_token(integration_id):
+            return eid
 
-    async with httpx.AsyncClient(timeout=120) as session:
-        response = await session.post(
-            url,
-            headers={'Content-Type': 'application/x-www-form-urlencoded'},
-            data=data
+        current_state = await state_manager.get_state(
+            integration_id,
+            "get_authentication_token"
         )
-        response.raise_for_status()
 
-    json_response = response.json()
+        if current_state.get("eid"):
+            eid = current_state["eid"]
+        else:
+            eid = await _login(integration, config)
+            await state_manager.set_state(
+                integration_id,
+                "get_authentication_token",
+                {"eid": eid}
+            )
+
+        _auth_token_cache[integration_id] = (eid, time.monotonic())
+
+    return eid
+
 
-    state = {
-        "eid": json_response.get("eid")
+async def forget_authentication_token(integration_id):
+    _auth_token_cache.pop(integration_id, None)
+    await state_manager.delete_state(integration_id, "get_authentication_token")
+
+
+def _get_url(integration, endpoint):
+    return f"{integration.base_url}{endpoint}"
+
+
+async def _login(integration, config):
+    data = {
+        "params": orjson.dumps({"token": config.token, "fl": "4"}).decode()
     }
-    await state_manager.set_state(
-        str(integration.id),
-        "get_authentication_token",
-        state
+
+    response = await get_http_client().post(
+        _get_url(integration, "ajax.html?svc=token/login"),
+        headers={'Content-Type': 'application/x-www-form-urlencoded'},
+        data=data
     )
+    _raise_for_status(response)
 
-    return json_response.get("eid")
+    # A rejected token comes back as {"error": <code>}, don't retry it nor save it
+    login_response = orjson.loads(response.content)
+    if login_response.get("error") or not login_response.get("eid"):
+        raise WialonErrorException(login_response.get("error"), "Wialon rejected the authentication token")
 
+    return login_response["eid"]
 
-async def get_positions_list(integration, config):
-    devices_endpoint = "ajax.html?svc=core/search_items"
 
+async def get_positions_list(integration, config):
+    # Only errors that may go away on their own are retried, other errors (e.g. 4xx) are raised right away.
+    # Connection errors get here once the transport retries are used up, so they are retried with backoff too
+    async for attempt in stamina.retry_context(
+            on=(httpx.TransportError, WialonServerError, WialonInvalidSessionException),
+            attempts=RETRY_ATTEMPTS,
+            wait_initial=RETRY_WAIT_INITIAL,
+            wait_max=RETRY_WAIT_MAX,
+            wait_jitter=RETRY_WAIT_JITTER,
+    ):
+        with attempt:
+            units = await _search_items(integration)
+    return units
+
+
+async def _search_items(integration):
     params = await build_request_params(integration)
 
-    url = f"{integration.base_url}{devices_endpoint}"
-
-    async with httpx.AsyncClient(timeout=120) as session:
-        response = await session.post(
-            url,
-            headers={'Content-Type': 'application/x-www-form-urlencoded'},
-            data=params
-        )
-        response.raise_for_status()
-
-    return WialonResponse.parse_obj({
-        "items": response.json().get("items")
-    })
+    response = await get_http_client().post(
+        _get_url(integration, "ajax.html?svc=core/search_items"),
+        headers={'Content-Type': 'application/x-www-form-urlencoded'},
+        data=params
+    )
+    _raise_for_status(response)
+
+    # orjson reads the body bytes as they are, pydantic's parse_raw() would decode them into a str copy first.
+    # Errors come in the same payload ({"error": <code>})
+    wialon_response = _parse_wialon_response(orjson.loads(response.content))
+    if wialon_response.error == 1:
+        # The session expired, so log in again on the next attempt
+        await forget_authentication_token(str(integration.id))
+        raise WialonInvalidSessionException(wialon_response.error, "Invalid Wialon session")
+    if wialon_response.error:
+        raise WialonErrorException(wialon_response.error)
+
+    return wialon_response.items
@@ -1,59 +1,71 @@
+import asyncio
 import datetime
 import httpx
-import json
 import logging
-import stamina
 import app.actions.client as client
 
 from app.actions.configurations import AuthenticateConfig, PullObservationsConfig
 from app.services.activity_logger import activity_logger
 from app.services.gundi import send_observations_to_gundi
-from app.services.state import IntegrationStateManager
+from app.services.state import state_manager
 
 
 logger = logging.getLogger(__name__)
 
 
-state_manager = IntegrationStateManager()
+# Large fleets are sent to Gundi in batches, a few of them at a time
+OBSERVATIONS_BATCH_SIZE = 200
+MAX_CONCURRENT_BATCHES = 5
+
+
+def transform(device):
+    pos = device.pos
+
+    return {
+        "source": device.id,
+        "source_name": device.nm,
+        'type': 'tracking-device',
+        "recorded_at": pos.t,
+        "location": {
+            "lat": pos.y,
+            "lon": pos.x
+        },
+        "additional": {
+            "sensors_flags": pos.f,
+            "course": pos.c,
+            "altitude": pos.z,
+            "speed": pos.s,
+            "satellites_count": pos.sc
+        }
+    }
 
 
 async def filter_and_transform(devices, integration_id, action_id):
-    def transform(device):
-        device_id = device.id
-        device_name = device.nm
-
-        device_positions = device.pos.dict(by_alias=True)
-
-        recorded_at = device_positions.pop("recorded_at")
-        lat = device_positions.pop("latitude")
-        lon = device_positions.pop("longitude")
-
-        return {
-            "source": device_id,
-            "source_name": device_name,
-            'type': 'tracking-device',
-            "recorded_at": recorded_at,
-            "location": {
-                "lat": lat,
-                "lon": lon
-            },
-            "additional": device_positions
-        }
+    # Devices without a last known position have nothing to report
+    devices = [device for device in devices if device.pos is not None]
+    if not devices:
+        return []
+
+    # Get current state for all the devices at once
+    states = await state_manager.get_states(
+        integration_id,
+        action_id,
+        [device.id for device in devices]
+    )
 
     transformed_data = []
+    # Local names save attribute lookups on every iteration
+    append = transformed_data.append
+    get_state = states.get
+    fromisoformat = datetime.datetime.fromisoformat
     for device in devices:
-        # Get current state for the device
-        current_state = await state_manager.get_state(
-            integration_id,
-            action_id,
-            device.id
-        )
+        current_state = get_state(device.id)
 
         if current_state:
             # Compare current state with new data
-            latest_device_timestamp = datetime.datetime.strptime(
-                current_state.get("latest_device_timestamp"),
-                '%Y-%m-%d %H:%M:%S%z'
+            # States are saved with str(datetime), which fromisoformat() parses natively
+            latest_device_timestamp = fromisoformat(
+                current_state.get("latest_device_timestamp")
             )
 
             if device.pos.t <= latest_device_timestamp:
@@ -63,11 +75,42 @@ async def filter_and_transform(devices, integration_id, action_id):
                 )
                 continue
 
-        transformed_data.append(transform(device))
+        append(transform(device))
 
     return transformed_data
 
 
+async def send_observations_in_batches(observations, integration_id, action_id):
+    """
+    Send observations to Gundi in concurrent batches, saving the devices state after each successful batch
+    :return: The Gundi response, or a list with one response per batch when there is more than one
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_BATCHES)
+
+    async def send_batch(batch):
+        async with semaphore:
+            response = await send_observations_to_gundi(
+                observations=batch,
+                integration_id=integration_id
+            )
+            # Update the state of all the devices in the batch at once
+            await state_manager.set_states(
+                integration_id,
+                action_id,
+                {
+                    vehicle.get("source"): {"latest_device_timestamp": vehicle.get("recorded_at")}
+                    for vehicle in batch
+                }
+            )
+            return response
+
+    responses = await asyncio.gather(*[
+        send_batch(observations[i:i + OBSERVATIONS_BATCH_SIZE])
+        for i in range(0, len(observations), OBSERVATIONS_BATCH_SIZE)
+    ])
+    return responses[0] if len(responses) == 1 else responses
+
+
 async def action_auth(integration, action_config: AuthenticateConfig):
     logger.info(f"Executing auth action with integration {integration} and action_config {action_config}...")
     try:
@@ -75,6 +118,9 @@ async def action_auth(integration, action_config: AuthenticateConfig):
             integration=integration,
             config=action_config
         )
+    except client.WialonErrorException as e:
+        logger.warning(f"Authentication rejected by Wialon: {e}")
+        return {"valid_credentials": False}
     except httpx.HTTPError as e:
         message = f"auth action returned error."
         logger.exception(message, extra={
@@ -95,7 +141,7 @@ async def action_fetch_samples(integration, action_config: PullObservationsConfi
             integration=integration,
             config=action_config
         )
-    except httpx.HTTPError as e:
+    except (httpx.HTTPError, client.WialonErrorException) as e:
         message = f"fetch_samples action returned error."
         logger.exception(message, extra={
             "integration_id": str(integration.id),
@@ -106,77 +152,54 @@ async def action_fetch_samples(integration, action_config: PullObservationsConfi
         logger.info(f"Observations pulled with success.")
         return {
             "observations_extracted": config.observations_to_extract,
-            "observations": [json.loads(vehicle.json()) for vehicle in vehicles.items][:config.observations_to_extract]
+            "observations": [vehicle.dict() for vehicle in vehicles[:config.observations_to_extract]]
         }
 
 
 @activity_logger()
 async def action_pull_observations(integration, action_config: PullObservationsConfig):
     logger.info(f"Executing pull_observations action with integration {integration} and action_config {action_config}...")
+    integration_id = str(integration.id)
     try:
-        async for attempt in stamina.retry_context(
-                on=httpx.HTTPError,
-                attempts=3,
-                wait_initial=datetime.timedelta(seconds=10),
-                wait_max=datetime.timedelta(seconds=10),
-        ):
-            with attempt:
-                vehicles = await client.get_positions_list(
-                    integration=integration,
-                    config=action_config
-                )
+        # Transient errors and expired sessions are retried by the client
+        vehicles = await client.get_positions_list(
+            integration=integration,
+            config=action_config
+        )
 
         logger.info(f"Observations pulled with success.")
 
         transformed_data = await filter_and_transform(
-            vehicles.items,
-            str(integration.id),
+            vehicles,
+            integration_id,
             "pull_observations"
         )
 
         if transformed_data:
-            async for attempt in stamina.retry_context(
-                    on=httpx.HTTPError,
-                    attempts=3,
-                    wait_initial=datetime.timedelta(seconds=10),
-                    wait_max=datetime.timedelta(seconds=10),
-            ):
-                with attempt:
-                    try:
-                        response = await send_observations_to_gundi(
-                            observations=transformed_data,
-                            integration_id=str(integration.id)
-                        )
-                    except httpx.HTTPError as e:
-                        msg = f'Sensors API returned error for integration_id: {str(integration.id)}. Exception: {e}'
-                        logger.exception(
-                            msg,
-                            extra={
-                                'needs_attention': True,
-                                'integration_id': str(integration.id),
-                                'action_id': "pull_observations"
-                            }
-                        )
-                        return [msg]
-                    else:
-                        for vehicle in transformed_data:
-                            # Update state
-                            state = {
-                                "latest_device_timestamp": vehicle.get("recorded_at")
-                            }
-                            await state_manager.set_state(
-                                str(integration.id),
-                                "pull_observations",
-                                state,
-                                vehicle.get("source")
-                            )
-
+            try:
+                # send_observations_to_gundi() retries on its own
+                response = await send_observations_in_batches(
+                    transformed_data,
+                    integration_id,
+                    "pull_observations"
+                )
+            except httpx.HTTPError as e:
+                msg = f'Sensors API returned error for integration_id: {integration_id}. Exception: {e}'
+                logger.exception(
+                    msg,
+                    extra={
+                        'needs_attention': True,
+                        'integration_id': integration_id,
+                        'action_id': "pull_observations"
+                    }
+                )
+                return [msg]
         else:
             response = []
-    except httpx.HTTPError as e:
+    except (httpx.HTTPError, client.WialonErrorException) as e:
         message = f"pull_observations action returned error."
         logger.exception(message, extra={
-            "integration_id": str(integration.id),
+            "integration_id": integration_id,
             "attention_needed": True
         })
         raise e
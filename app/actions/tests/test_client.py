@@ -0,0 +1,255 @@
+import asyncio
+import datetime
+import time
+
+import httpx
+import orjson
+import pytest
+import app.actions.client as client
+from app.actions.configurations import AuthenticateConfig
+
+
+async def test_http_client_is_shared_between_calls():
+    http_client = client.get_http_client()
+
+    assert client.get_http_client() is http_client
+    await client.close_http_client()
+
+
+async def test_http_client_retries_connection_errors():
+    http_client = client.get_http_client()
+
+    assert http_client._transport._pool._retries == client.CONNECT_RETRIES
+    await client.close_http_client()
+
+
+async def test_close_http_client():
+    http_client = client.get_http_client()
+
+    await client.close_http_client()
+
+    assert http_client.is_closed
+    new_http_client = client.get_http_client()
+    assert new_http_client is not http_client
+    await client.close_http_client()
+
+
+def test_get_auth_config(integration_v2):
+    auth_config = client.get_auth_config(integration_v2)
+
+    assert isinstance(auth_config, AuthenticateConfig)
+    assert str(integration_v2.id) in client._configs_by_action
+
+
+def test_get_auth_config_is_parsed_once(integration_v2):
+    auth_config = client.get_auth_config(integration_v2)
+
+    assert client.get_auth_config(integration_v2) is auth_config
+
+
+def test_get_auth_config_after_configurations_change(integration_v2):
+    auth_config = client.get_auth_config(integration_v2)
+
+    integration_v2.configurations = [
+        config.copy(update={"data": {"token": "newtoken"}}) if config.action.value == "auth" else config
+        for config in integration_v2.configurations
+    ]
+
+    new_auth_config = client.get_auth_config(integration_v2)
+    assert new_auth_config is not auth_config
+    assert new_auth_config.token == "newtoken"
+
+
+def test_find_config_after_configurations_change(integration_v2):
+    assert client.find_config(integration_v2, "auth") is not None
+
+    integration_v2.configurations = [
+        config for config in integration_v2.configurations if config.action.value != "auth"
+    ]
+
+    assert client.find_config(integration_v2, "auth") is None
+
+
+@pytest.fixture
+def auth_config():
+    return AuthenticateConfig(token="testtoken2a97022f21732461ee103a08fac8a35")
+
+
+async def test_get_authentication_token_from_cache(wialon_integration, auth_config, wialon_state_manager):
+    client._auth_token_cache[str(wialon_integration.id)] = ("cached-eid", time.monotonic())
+
+    eid = await client.get_authentication_token(wialon_integration, auth_config)
+
+    assert eid == "cached-eid"
+    wialon_state_manager.get_state.assert_not_called()
+
+
+async def test_get_authentication_token_with_expired_cache(wialon_integration, auth_config, wialon_state_manager):
+    wialon_state_manager.get_state.return_value = {"eid": "saved-eid"}
+    client._auth_token_cache[str(wialon_integration.id)] = (
+        "cached-eid", time.monotonic() - client.AUTH_TOKEN_CACHE_TTL - 1
+    )
+
+    eid = await client.get_authentication_token(wialon_integration, auth_config)
+
+    assert eid == "saved-eid"
+    wialon_state_manager.get_state.assert_awaited_once_with(str(wialon_integration.id), "get_authentication_token")
+    assert client._auth_token_cache[str(wialon_integration.id)][0] == "saved-eid"
+
+
+async def test_get_authentication_token_with_login(
+        mocker, monkeypatch, wialon_integration, auth_config, wialon_state_manager
+):
+    mock_login = mocker.AsyncMock(return_value="new-eid")
+    monkeypatch.setattr(client, "_login", mock_login)
+
+    eid = await client.get_authentication_token(wialon_integration, auth_config)
+
+    assert eid == "new-eid"
+    mock_login.assert_awaited_once_with(wialon_integration, auth_config)
+    wialon_state_manager.set_state.assert_awaited_once_with(
+        str(wialon_integration.id), "get_authentication_token", {"eid": "new-eid"}
+    )
+    assert client._auth_token_cache[str(wialon_integration.id)][0] == "new-eid"
+
+
+async def test_get_authentication_token_logs_in_once_for_concurrent_calls(
+        mocker, monkeypatch, wialon_integration, auth_config, wialon_state_manager
+):
+    async def login(integration, config):
+        await asyncio.sleep(0)
+        return "new-eid"
+
+    mock_login = mocker.AsyncMock(side_effect=login)
+    monkeypatch.setattr(client, "_login", mock_login)
+
+    eids = await asyncio.gather(
+        client.get_authentication_token(wialon_integration, auth_config),
+        client.get_authentication_token(wialon_integration, auth_config)
+    )
+
+    assert eids == ["new-eid", "new-eid"]
+    mock_login.assert_awaited_once()
+
+
+async def test_forget_authentication_token(wialon_integration, auth_config, wialon_state_manager):
+    client._auth_token_cache[str(wialon_integration.id)] = ("cached-eid", time.monotonic())
+
+    await client.forget_authentication_token(str(wialon_integration.id))
+
+    assert str(wialon_integration.id) not in client._auth_token_cache
+    wialon_state_manager.delete_state.assert_awaited_once_with(str(wialon_integration.id), "get_authentication_token")
+
+
+def wialon_response(payload, status_code=200):
+    return httpx.Response(status_code, content=orjson.dumps(payload))
+
+
+@pytest.fixture
+def mock_wialon_api(monkeypatch, async_stub):
+    def _mock_wialon_api(*responses):
+        # Payloads are sent back as 200 responses, responses are used as they are and exceptions are raised
+        responses = list(responses)
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return wialon_response(response) if isinstance(response, dict) else response
+
+        monkeypatch.setattr(client, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        monkeypatch.setattr(
+            client, "build_request_params", async_stub({"params": client.SEARCH_ITEMS_PARAMS, "sid": "eid"})
+        )
+        return requests
+    return _mock_wialon_api
+
+
+async def test_get_positions_list(mock_wialon_api, wialon_integration, wialon_units_response):
+    requests = mock_wialon_api(wialon_units_response)
+
+    units = await client.get_positions_list(wialon_integration, None)
+
+    assert requests[0].url.params["svc"] == "core/search_items"
+    assert [unit.id for unit in units] == [1001, 1002]
+    assert units[0].pos.t == datetime.datetime(2024, 1, 1, 12, 0, tzinfo=datetime.timezone.utc)
+
+
+async def test_get_positions_list_retries_with_invalid_session(
+        mocker, monkeypatch, mock_wialon_api, wialon_integration, wialon_units_response
+):
+    requests = mock_wialon_api({"error": 1}, wialon_units_response)
+    mock_forget_token = mocker.AsyncMock()
+    monkeypatch.setattr(client, "forget_authentication_token", mock_forget_token)
+
+    units = await client.get_positions_list(wialon_integration, None)
+
+    assert len(units) == 2
+    assert len(requests) == 2
+    mock_forget_token.assert_awaited_once_with(str(wialon_integration.id))
+
+
+@pytest.mark.parametrize("error_response", [
+    pytest.param(httpx.ConnectError("Connection refused"), id="connection_error"),
+    pytest.param(wialon_response({}, status_code=503), id="server_error"),
+])
+async def test_get_positions_list_retries_transient_errors(
+        mock_wialon_api, wialon_integration, wialon_units_response, error_response
+):
+    requests = mock_wialon_api(error_response, wialon_units_response)
+
+    units = await client.get_positions_list(wialon_integration, None)
+
+    assert len(units) == 2
+    assert len(requests) == 2
+
+
+@pytest.mark.parametrize("error_response, expected_exception", [
+    pytest.param({"error": 5}, client.WialonErrorException, id="wialon_error"),
+    pytest.param(wialon_response({}, status_code=403), httpx.HTTPStatusError, id="client_error"),
+])
+async def test_get_positions_list_does_not_retry_other_errors(
+        mock_wialon_api, wialon_integration, error_response, expected_exception
+):
+    requests = mock_wialon_api(error_response)
+
+    with pytest.raises(expected_exception):
+        await client.get_positions_list(wialon_integration, None)
+
+    assert len(requests) == 1
+
+
+async def test_build_request_params(monkeypatch, async_stub, integration_v2):
+    monkeypatch.setattr(client, "get_authentication_token", async_stub("eid"))
+
+    params = await client.build_request_params(integration_v2)
+
+    assert params["sid"] == "eid"
+    assert orjson.loads(params["params"]) == {
+        "spec": {"itemsType": "avl_unit", "propName": "sys_name, sys_id", "propValueMask": "*", "sortType": "sys_name"},
+        "force": 1,
+        "flags": 1025,
+        "from": 0,
+        "to": 0
+    }
+
+
+async def test_login_with_rejected_token(mock_wialon_api, wialon_integration, auth_config):
+    requests = mock_wialon_api({"error": 4})
+
+    with pytest.raises(client.WialonErrorException):
+        await client._login(wialon_integration, auth_config)
+
+    assert requests[0].url.params["svc"] == "token/login"
+
+
+async def test_rejected_token_is_not_saved(mocker, monkeypatch, wialon_integration, auth_config, wialon_state_manager):
+    monkeypatch.setattr(client, "_login", mocker.AsyncMock(side_effect=client.WialonErrorException(4)))
+
+    with pytest.raises(client.WialonErrorException):
+        await client.get_authentication_token(wialon_integration, auth_config)
+
+    wialon_state_manager.set_state.assert_not_called()
+    assert str(wialon_integration.id) not in client._auth_token_cache
@@ -0,0 +1,127 @@
+import pytest
+import app.actions.client as client
+import app.actions.handlers as handlers
+
+
+async def test_filter_and_transform_keeps_all_position_fields(wialon_state_manager, wialon_units):
+    observations = await handlers.filter_and_transform(wialon_units, "integration-id", "pull_observations")
+
+    assert len(observations) == len(wialon_units)
+    for unit, observation in zip(wialon_units, observations):
+        # Every position field must end up in the observation, as .dict(by_alias=True) would give them
+        positions = unit.pos.dict(by_alias=True)
+        assert observation["source"] == unit.id
+        assert observation["source_name"] == unit.nm
+        assert observation["recorded_at"] == positions.pop("recorded_at")
+        assert observation["location"] == {"lat": positions.pop("latitude"), "lon": positions.pop("longitude")}
+        assert observation["additional"] == positions
+
+
+async def test_filter_and_transform_excludes_devices_without_new_data(wialon_state_manager, wialon_units):
+    truck_1, truck_2 = wialon_units
+    wialon_state_manager.get_states.return_value = {
+        # Truck 1 was already reported
+        truck_1.id: {"latest_device_timestamp": str(truck_1.pos.t)},
+        truck_2.id: {}
+    }
+    # A device that never reported a position
+    truck_3 = client.WialonDataResponse(nm="Truck 3", id=1003)
+
+    observations = await handlers.filter_and_transform(
+        [truck_1, truck_2, truck_3], "integration-id", "pull_observations"
+    )
+
+    assert [observation["source"] for observation in observations] == [truck_2.id]
+    wialon_state_manager.get_states.assert_awaited_once_with(
+        "integration-id", "pull_observations", [truck_1.id, truck_2.id]
+    )
+
+
+async def test_action_pull_observations_saves_device_states(
+        mocker, monkeypatch, async_stub, wialon_state_manager, mock_publish_event, wialon_integration, wialon_units
+):
+    monkeypatch.setattr("app.services.activity_logger.publish_event", mock_publish_event)
+    monkeypatch.setattr(client, "get_positions_list", async_stub(wialon_units))
+    # The activity logger only accepts a dict as the action result
+    mock_send_observations = mocker.AsyncMock(return_value={"id": "obs-id"})
+    monkeypatch.setattr(handlers, "send_observations_to_gundi", mock_send_observations)
+
+    await handlers.action_pull_observations(wialon_integration, client.PullObservationsConfig())
+
+    mock_send_observations.assert_awaited_once()
+    wialon_state_manager.set_states.assert_awaited_once_with(
+        str(wialon_integration.id),
+        "pull_observations",
+        {unit.id: {"latest_device_timestamp": unit.pos.t} for unit in wialon_units}
+    )
+
+
+async def test_action_fetch_samples(monkeypatch, async_stub, wialon_integration, wialon_units):
+    monkeypatch.setattr(
+        client, "get_fetch_samples_config", lambda integration: client.FetchSamplesConfig(observations_to_extract=1)
+    )
+    monkeypatch.setattr(client, "get_positions_list", async_stub(wialon_units))
+
+    result = await handlers.action_fetch_samples(wialon_integration, client.PullObservationsConfig())
+
+    assert result == {
+        "observations_extracted": 1,
+        "observations": [wialon_units[0].dict()]
+    }
+
+
+async def test_filter_and_transform_without_devices(wialon_state_manager):
+    observations = await handlers.filter_and_transform(
+        [client.WialonDataResponse(nm="Truck 3", id=1003)], "integration-id", "pull_observations"
+    )
+
+    assert observations == []
+    wialon_state_manager.get_states.assert_not_called()
+
+
+def test_actions_share_the_state_manager():
+    assert handlers.state_manager is client.state_manager
+
+
+async def test_action_pull_observations_with_wialon_error(mocker, monkeypatch, mock_publish_event, wialon_integration):
+    monkeypatch.setattr("app.services.activity_logger.publish_event", mock_publish_event)
+    monkeypatch.setattr(client, "get_positions_list", mocker.AsyncMock(side_effect=client.WialonErrorException(5)))
+    mock_logger = mocker.MagicMock()
+    monkeypatch.setattr(handlers, "logger", mock_logger)
+
+    with pytest.raises(client.WialonErrorException):
+        await handlers.action_pull_observations(wialon_integration, client.PullObservationsConfig())
+
+    mock_logger.exception.assert_called_once_with(
+        "pull_observations action returned error.",
+        extra={"integration_id": str(wialon_integration.id), "attention_needed": True}
+    )
+
+
+async def test_action_auth_with_rejected_token(mocker, monkeypatch, wialon_integration):
+    monkeypatch.setattr(
+        client, "get_authentication_token", mocker.AsyncMock(side_effect=client.WialonErrorException(4))
+    )
+
+    result = await handlers.action_auth(wialon_integration, client.AuthenticateConfig(token="invalid"))
+
+    assert result == {"valid_credentials": False}
+
+
+async def test_send_observations_in_batches(mocker, monkeypatch, wialon_state_manager, wialon_units):
+    monkeypatch.setattr(handlers, "OBSERVATIONS_BATCH_SIZE", 1)
+    mock_send_observations = mocker.AsyncMock(return_value=[{"id": "obs-id"}])
+    monkeypatch.setattr(handlers, "send_observations_to_gundi", mock_send_observations)
+    observations = [handlers.transform(unit) for unit in wialon_units]
+
+    response = await handlers.send_observations_in_batches(observations, "integration-id", "pull_observations")
+
+    assert response == [[{"id": "obs-id"}], [{"id": "obs-id"}]]
+    assert mock_send_observations.await_count == 2
+    for observation in observations:
+        mock_send_observations.assert_any_await(observations=[observation], integration_id="integration-id")
+        wialon_state_manager.set_states.assert_any_await(
+            "integration-id",
+            "pull_observations",
+            {observation["source"]: {"latest_device_timestamp": observation["recorded_at"]}}
+        )
@@ -1,8 +1,10 @@
 import asyncio
 import datetime
 import json
+import uuid
 
 import pytest
+from types import SimpleNamespace
 from unittest.mock import MagicMock
 from app import settings
 from gcloud.aio import pubsub
@@ -21,6 +23,8 @@ from gundi_core.events import (
 )
 
 from app.actions import PullActionConfiguration
+import app.actions.client as wialon_client
+import app.services.gundi as gundi_service
 
 
 class AsyncMock(MagicMock):
@@ -34,6 +38,36 @@ def async_return(result):
     return f
 
 
+@pytest.fixture
+def async_stub():
+    # Cheaper than an AsyncMock, for patched coroutines whose calls aren't checked
+    def _async_stub(result):
+        async def stub(*args, **kwargs):
+            return result
+        return stub
+    return _async_stub
+
+
+@pytest.fixture(autouse=True)
+def reset_wialon_client(monkeypatch):
+    # Each test runs in its own event loop, so the shared HTTP client can't be reused across tests
+    monkeypatch.setattr(wialon_client, "_http_client", None)
+    monkeypatch.setattr(wialon_client, "_auth_token_cache", {})
+    monkeypatch.setattr(wialon_client, "_auth_token_locks", {})
+    monkeypatch.setattr(wialon_client, "_configs_by_action", {})
+    monkeypatch.setattr(wialon_client, "_auth_configs", {})
+    # Retries must not slow the tests down
+    monkeypatch.setattr(wialon_client, "RETRY_WAIT_INITIAL", datetime.timedelta(0))
+    monkeypatch.setattr(wialon_client, "RETRY_WAIT_MAX", datetime.timedelta(0))
+    monkeypatch.setattr(wialon_client, "RETRY_WAIT_JITTER", datetime.timedelta(0))
+
+
+@pytest.fixture(autouse=True)
+def reset_sensors_api_clients(monkeypatch):
+    # Clients cached by one test must not be used by the next one
+    monkeypatch.setattr(gundi_service, "_sensors_api_clients", {})
+
+
 @pytest.fixture
 def mock_integration_state():
     return {"last_execution": "2024-01-29T11:20:00+0200"}
@@ -44,7 +78,12 @@ def mock_redis(mocker, mock_integration_state):
     redis = MagicMock()
     redis_client = mocker.MagicMock()
     redis_client.set.return_value = async_return(MagicMock())
+    redis_client.mset.return_value = async_return(MagicMock())
     redis_client.get.return_value = async_return(json.dumps(mock_integration_state, default=str))
+    # One value per requested key: only the first key has a saved state
+    redis_client.mget.side_effect = lambda keys: async_return(
+        [json.dumps(mock_integration_state, default=str)] + [None] * (len(keys) - 1)
+    )
     redis_client.delete.return_value = async_return(MagicMock())
     redis_client.setex.return_value = async_return(None)
     redis_client.incr.return_value = redis_client
@@ -223,6 +262,52 @@ def mock_state_manager(mocker):
     return mock_state_manager
 
 
+@pytest.fixture
+def wialon_state_manager(mocker, monkeypatch):
+    # The Wialon client and handlers share one state manager, patched in both modules at once
+    state_manager = mocker.MagicMock()
+    state_manager.get_state = mocker.AsyncMock(return_value={})
+    state_manager.set_state = mocker.AsyncMock()
+    state_manager.delete_state = mocker.AsyncMock()
+    state_manager.get_states = mocker.AsyncMock(return_value={})
+    state_manager.set_states = mocker.AsyncMock()
+    monkeypatch.setattr("app.actions.client.state_manager", state_manager)
+    monkeypatch.setattr("app.actions.handlers.state_manager", state_manager)
+    return state_manager
+
+
+@pytest.fixture
+def wialon_integration():
+    # Only what the Wialon actions read from an integration, for tests that don't need its configurations
+    return SimpleNamespace(
+        id=uuid.UUID("779ff3ab-5589-4f4c-9e0a-ae8d6c9edff0"),
+        base_url="https://hst-api.wialon.com/wialon/"
+    )
+
+
+@pytest.fixture
+def wialon_units_response():
+    return {
+        "items": [
+            {
+                "nm": "Truck 1",
+                "id": 1001,
+                "pos": {"t": 1704110400, "f": 1, "y": -51.748, "x": -72.720, "c": 90, "z": 120.0, "s": 40, "sc": 9}
+            },
+            {
+                "nm": "Truck 2",
+                "id": 1002,
+                "pos": {"t": 1704110460, "f": 1, "y": -51.755, "x": -72.755, "c": 180, "z": 98.5, "s": 0, "sc": 7}
+            }
+        ]
+    }
+
+
+@pytest.fixture
+def wialon_units(wialon_units_response):
+    return wialon_client.WialonResponse.parse_obj(wialon_units_response).items
+
+
 @pytest.fixture
 def mock_pubsub_client(
         mocker, integration_event_pubsub_message, gcp_pubsub_publish_response
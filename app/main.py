@@ -15,6 +15,7 @@ from app.routers import (
 import app.settings as settings
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.actions.client import close_http_client
 from app.services.action_runner import execute_action, _portal
 from app.services.self_registration import register_integration_in_gundi
 
@@ -31,6 +32,7 @@ async def lifespan(app: FastAPI):
     yield
     # Shotdown Hook
     await _portal.close()
+    await close_http_client()
 
 
 app = FastAPI(
@@ -5,6 +5,10 @@ import stamina
 from gundi_client_v2.client import GundiClient, GundiDataSenderClient
 
 
+# Sensors API clients kept per integration, so batches don't ask the Gundi API for the key every time
+_sensors_api_clients = {}  # integration_id -> GundiDataSenderClient
+
+
 @stamina.retry(on=httpx.HTTPError, attempts=3, wait_initial=datetime.timedelta(seconds=1), wait_max=datetime.timedelta(seconds=10))
 async def _get_gundi_api_key(integration_id):
     async with GundiClient() as gundi_client:
@@ -14,14 +18,23 @@ async def _get_gundi_api_key(integration_id):
 
 
 async def _get_sensors_api_client(integration_id):
+    if sensors_api_client := _sensors_api_clients.get(integration_id):
+        return sensors_api_client
     gundi_api_key = await _get_gundi_api_key(integration_id=integration_id)
     assert gundi_api_key, f"Cannot get a valid API Key for integration {integration_id}"
     sensors_api_client = GundiDataSenderClient(
         integration_api_key=gundi_api_key
     )
+    _sensors_api_clients[integration_id] = sensors_api_client
     return sensors_api_client
 
 
+def _forget_sensors_api_client_on_auth_error(integration_id, error):
+    # The API key may have been revoked or rotated, get it again on the next attempt
+    if error.response.status_code in (401, 403):
+        _sensors_api_clients.pop(integration_id, None)
+
+
 @stamina.retry(on=httpx.HTTPError, attempts=3, wait_initial=datetime.timedelta(seconds=1), wait_max=datetime.timedelta(seconds=10))
 async def send_events_to_gundi(events: List[dict], **kwargs) -> dict:
     """
@@ -47,8 +60,13 @@ async def send_events_to_gundi(events: List[dict], **kwargs) -> dict:
     """
     integration_id = kwargs.get("integration_id")
     assert integration_id, "integration_id is required"
-    sensors_api_client = await _get_sensors_api_client(integration_id=str(integration_id))
-    return await sensors_api_client.post_events(data=events)
+    integration_id = str(integration_id)
+    sensors_api_client = await _get_sensors_api_client(integration_id=integration_id)
+    try:
+        return await sensors_api_client.post_events(data=events)
+    except httpx.HTTPStatusError as e:
+        _forget_sensors_api_client_on_auth_error(integration_id, e)
+        raise
 
 
 @stamina.retry(on=httpx.HTTPError, attempts=3, wait_initial=datetime.timedelta(seconds=1), wait_max=datetime.timedelta(seconds=10))
@@ -77,5 +95,10 @@ async def send_observations_to_gundi(observations: List[dict], **kwargs) -> dict
     """
     integration_id = kwargs.get("integration_id")
     assert integration_id, "integration_id is required"
-    sensors_api_client = await _get_sensors_api_client(integration_id=str(integration_id))
-    return await sensors_api_client.post_observations(data=observations)
+    integration_id = str(integration_id)
+    sensors_api_client = await _get_sensors_api_client(integration_id=integration_id)
+    try:
+        return await sensors_api_client.post_observations(data=observations)
+    except httpx.HTTPStatusError as e:
+        _forget_sensors_api_client_on_auth_error(integration_id, e)
+        raise
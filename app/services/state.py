@@ -16,12 +16,33 @@ class IntegrationStateManager:
         value = json.loads(json_value) if json_value else {}
         return value
 
+    async def get_states(self, integration_id: str, action_id: str, source_ids: list) -> dict:
+        if not source_ids:
+            return {}
+        # Fetch the states of many sources in a single round trip
+        json_values = await self.db_client.mget(
+            [f"integration_state.{integration_id}.{action_id}.{source_id}" for source_id in source_ids]
+        )
+        return {
+            source_id: json.loads(json_value) if json_value else {}
+            for source_id, json_value in zip(source_ids, json_values)
+        }
+
     async def set_state(self, integration_id: str, action_id: str, state: dict, source_id: str = "no-source"):
         await self.db_client.set(
             f"integration_state.{integration_id}.{action_id}.{source_id}",
             json.dumps(state, default=str)
         )
 
+    async def set_states(self, integration_id: str, action_id: str, states: dict):
+        if not states:
+            return
+        # Save the states of many sources (source_id -> state) in a single round trip
+        await self.db_client.mset({
+            f"integration_state.{integration_id}.{action_id}.{source_id}": json.dumps(state, default=str)
+            for source_id, state in states.items()
+        })
+
     async def delete_state(self, integration_id: str, action_id: str, source_id: str = "no-source"):
         await self.db_client.delete(
             f"integration_state.{integration_id}.{action_id}.{source_id}"
@@ -32,3 +53,7 @@ class IntegrationStateManager:
 
     def __repr__(self):
         return self.__str__()
+
+
+# Shared by all the actions, so they use a single Redis connection pool
+state_manager = IntegrationStateManager()
@@ -1,7 +1,6 @@
 import base64
 import json
 
-import pytest
 from fastapi.testclient import TestClient
 from app.main import app
 
@@ -9,7 +8,6 @@ from app.main import app
 api_client = TestClient(app)
 
 
-@pytest.mark.asyncio
 async def test_execute_action_from_pubsub(
         mocker, mock_gundi_client_v2, mock_publish_event, mock_action_handlers,
         event_v2_cloud_event_headers, event_v2_cloud_event_payload
@@ -31,7 +29,6 @@ async def test_execute_action_from_pubsub(
     assert mock_action_handler.called
 
 
-@pytest.mark.asyncio
 async def test_execute_action_from_api(
         mocker, mock_gundi_client_v2, integration_v2,
         mock_publish_event, mock_action_handlers,
@@ -55,7 +52,6 @@ async def test_execute_action_from_api(
     assert mock_action_handler.called
 
 
-@pytest.mark.asyncio
 async def test_execute_action_from_api_with_config_overrides(
         mocker, mock_gundi_client_v2, integration_v2,
         mock_publish_event, mock_action_handlers,
@@ -84,7 +80,6 @@ async def test_execute_action_from_api_with_config_overrides(
         assert getattr(config, k) == v
 
 
-@pytest.mark.asyncio
 async def test_execute_action_from_pubsub_with_config_overrides(
         mocker, mock_gundi_client_v2, mock_publish_event, mock_action_handlers,
         event_v2_cloud_event_headers, event_v2_cloud_event_payload_with_config_overrides
@@ -112,7 +107,6 @@ async def test_execute_action_from_pubsub_with_config_overrides(
         assert getattr(config, k) == v
 
 
-@pytest.mark.asyncio
 async def test_execute_action_from_api_with_invalid_config(
         mocker, mock_gundi_client_v2, integration_v2,
         mock_publish_event, mock_action_handlers,
@@ -15,7 +15,6 @@ from app.services.activity_logger import publish_event, activity_logger, log_act
     "system_event",
     ["action_started_event", "action_complete_event", "action_failed_event", "custom_activity_log_event"],
     indirect=["system_event"])
-@pytest.mark.asyncio
 async def test_publish_event(
         mocker, mock_pubsub_client, integration_event_pubsub_message, gcp_pubsub_publish_response,
         system_event
@@ -38,7 +37,6 @@ async def test_publish_event(
     )
 
 
-@pytest.mark.asyncio
 async def test_activity_logger_decorator(
         mocker, mock_publish_event, integration_v2, pull_observations_config
 ):
@@ -60,7 +58,6 @@ async def test_activity_logger_decorator(
     assert isinstance(mock_publish_event.call_args_list[1].kwargs.get("event"), IntegrationActionComplete)
 
 
-@pytest.mark.asyncio
 async def test_activity_logger_decorator_with_arguments(
         mocker, mock_publish_event, integration_v2, pull_observations_config
 ):
@@ -81,7 +78,6 @@ async def test_activity_logger_decorator_with_arguments(
     assert isinstance(mock_publish_event.call_args_list[0].kwargs.get("event"), IntegrationActionComplete)
 
 
-@pytest.mark.asyncio
 async def test_activity_logger_decorator_on_error(
         mocker, mock_publish_event, integration_v2, pull_observations_config
 ):
@@ -104,7 +100,6 @@ async def test_activity_logger_decorator_on_error(
     assert isinstance(mock_publish_event.call_args_list[1].kwargs.get("event"), IntegrationActionFailed)
 
 
-@pytest.mark.asyncio
 async def test_log_activity_with_debug_level(mocker, integration_v2, pull_observations_config, mock_publish_event):
     mocker.patch("app.services.activity_logger.publish_event", mock_publish_event)
     await log_activity(
@@ -119,7 +114,6 @@ async def test_log_activity_with_debug_level(mocker, integration_v2, pull_observ
     assert isinstance(mock_publish_event.call_args_list[0].kwargs.get("event"), IntegrationActionCustomLog)
 
 
-@pytest.mark.asyncio
 async def test_log_activity_with_info_level(mocker, integration_v2, mock_publish_event, pull_observations_config):
     mocker.patch("app.services.activity_logger.publish_event", mock_publish_event)
     await log_activity(
@@ -134,7 +128,6 @@ async def test_log_activity_with_info_level(mocker, integration_v2, mock_publish
     assert isinstance(mock_publish_event.call_args_list[0].kwargs.get("event"), IntegrationActionCustomLog)
 
 
-@pytest.mark.asyncio
 async def test_log_activity_with_warning_level(mocker, integration_v2, mock_publish_event, pull_observations_config):
     mocker.patch("app.services.activity_logger.publish_event", mock_publish_event)
     await log_activity(
@@ -148,7 +141,6 @@ async def test_log_activity_with_warning_level(mocker, integration_v2, mock_publ
     assert isinstance(mock_publish_event.call_args_list[0].kwargs.get("event"), IntegrationActionCustomLog)
 
 
-@pytest.mark.asyncio
 async def test_log_activity_with_error_level(mocker, integration_v2, mock_publish_event, pull_observations_config):
     mocker.patch("app.services.activity_logger.publish_event", mock_publish_event)
     await log_activity(
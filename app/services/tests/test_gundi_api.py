@@ -1,8 +1,9 @@
+import httpx
 import pytest
+import app.services.gundi as gundi_service
 from app.services.gundi import send_events_to_gundi, send_observations_to_gundi
 
 
-@pytest.mark.asyncio
 async def test_send_events_to_gundi(
         mocker, mock_gundi_client_v2_class, mock_gundi_sensors_client_class,
         mock_get_gundi_api_key, integration_v2
@@ -49,7 +50,6 @@ async def test_send_events_to_gundi(
     mock_gundi_sensors_client_class.return_value.post_events.assert_called_once_with(data=events)
 
 
-@pytest.mark.asyncio
 async def test_send_observations_to_gundi(
         mocker, mock_gundi_client_v2_class, mock_gundi_sensors_client_class,
         mock_get_gundi_api_key, integration_v2
@@ -94,3 +94,34 @@ async def test_send_observations_to_gundi(
     assert len(response) == 2
     assert mock_gundi_sensors_client_class.called
     mock_gundi_sensors_client_class.return_value.post_observations.assert_called_once_with(data=observations)
+
+
+async def test_send_observations_to_gundi_reuses_the_sensors_api_client(
+        mocker, mock_gundi_sensors_client_class, mock_get_gundi_api_key, integration_v2
+):
+    mocker.patch("app.services.gundi.GundiDataSenderClient", mock_gundi_sensors_client_class)
+    mocker.patch("app.services.gundi._get_gundi_api_key", mock_get_gundi_api_key)
+    observations = [{"source": "device-xy123", "recorded_at": "2024-01-24 09:03:00-0300"}]
+
+    await send_observations_to_gundi(observations=observations, integration_id=integration_v2.id)
+    await send_observations_to_gundi(observations=observations, integration_id=integration_v2.id)
+
+    mock_get_gundi_api_key.assert_called_once_with(integration_id=str(integration_v2.id))
+    mock_gundi_sensors_client_class.assert_called_once()
+
+
+async def test_send_observations_to_gundi_with_rejected_api_key(
+        mocker, mock_gundi_sensors_client_class, mock_get_gundi_api_key, integration_v2
+):
+    mocker.patch("app.services.gundi.GundiDataSenderClient", mock_gundi_sensors_client_class)
+    mocker.patch("app.services.gundi._get_gundi_api_key", mock_get_gundi_api_key)
+    request = httpx.Request("POST", "https://sensors.api.gundiservice.org/v2/observations/")
+    mock_gundi_sensors_client_class.return_value.post_observations.side_effect = httpx.HTTPStatusError(
+        "Unauthorized", request=request, response=httpx.Response(401, request=request)
+    )
+
+    with pytest.raises(httpx.HTTPStatusError):
+        # Called without the retries
+        await send_observations_to_gundi.__wrapped__(observations=[], integration_id=integration_v2.id)
+
+    assert str(integration_v2.id) not in gundi_service._sensors_api_clients
@@ -1,4 +1,3 @@
-import pytest
 from fastapi.testclient import TestClient
 from app.main import app
 from app.services.self_registration import register_integration_in_gundi
@@ -6,7 +5,6 @@ from app.services.self_registration import register_integration_in_gundi
 api_client = TestClient(app)
 
 
-@pytest.mark.asyncio
 async def test_register_integration_with_slug_setting(mocker, mock_gundi_client_v2, mock_action_handlers):
     mocker.patch("app.services.self_registration.INTEGRATION_TYPE_SLUG", "x_tracker")
     mocker.patch("app.services.self_registration.action_handlers", mock_action_handlers)
@@ -41,7 +39,6 @@ async def test_register_integration_with_slug_setting(mocker, mock_gundi_client_
     )
 
 
-@pytest.mark.asyncio
 async def test_register_integration_with_slug_arg(mocker, mock_gundi_client_v2, mock_action_handlers):
     mocker.patch("app.services.action_runner.action_handlers", mock_action_handlers)
     mocker.patch("app.services.self_registration.action_handlers", mock_action_handlers)
@@ -76,7 +73,6 @@ async def test_register_integration_with_slug_arg(mocker, mock_gundi_client_v2,
     )
 
 
-@pytest.mark.asyncio
 async def test_register_integration_with_service_url_arg(mocker, mock_gundi_client_v2, mock_action_handlers):
     mocker.patch("app.services.self_registration.INTEGRATION_TYPE_SLUG", "x_tracker")
     mocker.patch("app.services.self_registration.action_handlers", mock_action_handlers)
@@ -116,7 +112,6 @@ async def test_register_integration_with_service_url_arg(mocker, mock_gundi_clie
     )
 
 
-@pytest.mark.asyncio
 async def test_register_integration_with_service_url_setting(mocker, mock_gundi_client_v2, mock_action_handlers):
     service_url = "https://xtracker-actions-runner-jabcutl8yb-uc.a.run.app"
     mocker.patch("app.services.self_registration.INTEGRATION_TYPE_SLUG", "x_tracker")
@@ -1,11 +1,9 @@
 import datetime
 import json
 
-import pytest
 from app.services.state import IntegrationStateManager
 
 
-@pytest.mark.asyncio
 async def test_set_integration_state(mocker, mock_redis, integration_v2):
     mocker.patch("app.services.state.redis", mock_redis)
     state_manager = IntegrationStateManager()
@@ -26,7 +24,6 @@ async def test_set_integration_state(mocker, mock_redis, integration_v2):
     )
 
 
-@pytest.mark.asyncio
 async def test_get_integration_state(mocker, mock_redis, integration_v2, mock_integration_state):
     mocker.patch("app.services.state.redis", mock_redis)
     state_manager = IntegrationStateManager()
@@ -44,7 +41,6 @@ async def test_get_integration_state(mocker, mock_redis, integration_v2, mock_in
     )
 
 
-@pytest.mark.asyncio
 async def test_delete_integration_state(mocker, mock_redis, integration_v2):
     mocker.patch("app.services.state.redis", mock_redis)
     state_manager = IntegrationStateManager()
@@ -80,7 +76,6 @@ async def test_delete_integration_state(mocker, mock_redis, integration_v2):
     )
 
 
-@pytest.mark.asyncio
 async def test_set_source_state(mocker, mock_redis, integration_v2, mock_integration_state):
     mocker.patch("app.services.state.redis", mock_redis)
     state_manager = IntegrationStateManager()
@@ -100,7 +95,6 @@ async def test_set_source_state(mocker, mock_redis, integration_v2, mock_integra
     )
 
 
-@pytest.mark.asyncio
 async def test_get_state_source_state(mocker, mock_redis, integration_v2, mock_integration_state):
     mocker.patch("app.services.state.redis", mock_redis)
     state_manager = IntegrationStateManager()
@@ -119,7 +113,6 @@ async def test_get_state_source_state(mocker, mock_redis, integration_v2, mock_i
     )
 
 
-@pytest.mark.asyncio
 async def test_delete_state_source_state(mocker, mock_redis, integration_v2, mock_integration_state):
     mocker.patch("app.services.state.redis", mock_redis)
     state_manager = IntegrationStateManager()
@@ -150,3 +143,43 @@ async def test_delete_state_source_state(mocker, mock_redis, integration_v2, moc
     mock_redis.Redis.return_value.delete.assert_called_once_with(
         f"integration_state.{integration_id}.pull_observations.{source_id}"
     )
+
+
+async def test_get_states_of_many_sources(mocker, mock_redis, integration_v2, mock_integration_state):
+    mocker.patch("app.services.state.redis", mock_redis)
+    state_manager = IntegrationStateManager()
+    integration_id = str(integration_v2.id)
+
+    states = await state_manager.get_states(
+        integration_id=integration_id,
+        action_id="pull_observations",
+        source_ids=["device-123", "device-456", "device-789"]
+    )
+
+    assert states == {"device-123": mock_integration_state, "device-456": {}, "device-789": {}}
+    mock_redis.Redis.return_value.mget.assert_called_once_with(
+        [
+            f"integration_state.{integration_id}.pull_observations.device-123",
+            f"integration_state.{integration_id}.pull_observations.device-456",
+            f"integration_state.{integration_id}.pull_observations.device-789"
+        ]
+    )
+
+
+async def test_set_states_of_many_sources(mocker, mock_redis, integration_v2, mock_integration_state):
+    mocker.patch("app.services.state.redis", mock_redis)
+    state_manager = IntegrationStateManager()
+    integration_id = str(integration_v2.id)
+
+    await state_manager.set_states(
+        integration_id=integration_id,
+        action_id="pull_observations",
+        states={"device-123": mock_integration_state, "device-456": mock_integration_state}
+    )
+
+    mock_redis.Redis.return_value.mset.assert_called_once_with(
+        {
+            f"integration_state.{integration_id}.pull_observations.device-123": json.dumps(mock_integration_state, default=str),
+            f"integration_state.{integration_id}.pull_observations.device-456": json.dumps(mock_integration_state, default=str)
+        }
+    )